@@ -1,7 +1,7 @@
 import os
 import sys
 import io
-import json
+import orjson
 import pandas as pd
 from prefect import flow, task
 
@@ -10,11 +10,14 @@ from prefect import flow, task
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.database import get_supabase_client
-from src.config import BUCKET_INPUT, BUCKET_MAPPING, BUCKET_OUTPUT
+from src.config import BUCKET_INPUT, BUCKET_MAPPING, BUCKET_OUTPUT, output_filename_for
 from src.processing import (
     standard_cleanup, 
     extract_geography, 
     fill_dimensions, 
+    detect_encoding,
+    ENCODING_SAMPLE_BYTES,
+    EXCEL_ENGINE,
     calculate_financials as proc_calculate_financials
 )
 
@@ -27,19 +30,25 @@ supabase = get_supabase_client()
 def load_and_init(config_filename):
     print(f"Loading Config: {config_filename}...")
     res_conf = supabase.storage.from_(BUCKET_MAPPING).download(config_filename)
-    config = json.loads(res_conf)
+    config = orjson.loads(res_conf)
     
     source_file = config["source_file"]
     print(f"Loading Data: {source_file}...")
     res_data = supabase.storage.from_(BUCKET_INPUT).download(source_file)
     
     if source_file.lower().endswith(('.xlsx', '.xls')):
-        df = pd.read_excel(io.BytesIO(res_data))
+        df = pd.read_excel(io.BytesIO(res_data), engine=EXCEL_ENGINE)
     else:
+        encoding = detect_encoding(res_data[:ENCODING_SAMPLE_BYTES]) or 'utf-8'
         try:
-            df = pd.read_csv(io.BytesIO(res_data), encoding='utf-8')
-        except UnicodeDecodeError:
-            df = pd.read_csv(io.BytesIO(res_data), encoding='cp1252')
+            # Multithreaded parse; NumPy-backed dtypes since the processing steps expect them
+            df = pd.read_csv(io.BytesIO(res_data), encoding=encoding, engine='pyarrow')
+        except Exception:
+            # pyarrow rejects some inputs the C engine tolerates (and decode errors surface differently)
+            try:
+                df = pd.read_csv(io.BytesIO(res_data), encoding=encoding)
+            except UnicodeDecodeError:
+                df = pd.read_csv(io.BytesIO(res_data), encoding='cp1252')
 
     # Cleanup Headers & Rename
     df.columns = [str(c).strip() for c in df.columns]
@@ -139,9 +148,8 @@ def validate_and_clean(df: pd.DataFrame, config: dict):
     if 'lat' in df.columns and 'lon' in df.columns:
         cols_to_exclude.add('coordinates')
 
-    final_cols = list(set(keep_cols + core_cols) - cols_to_exclude)
-    
-    existing_cols = [c for c in final_cols if c in df.columns]
+    # Ordered de-dupe: mapped columns first, in mapping order, then the core columns
+    existing_cols = [c for c in dict.fromkeys(keep_cols + core_cols) if c not in cols_to_exclude and c in df.columns]
     
     validated_rows = len(df)
     
@@ -157,8 +165,7 @@ def validate_and_clean(df: pd.DataFrame, config: dict):
 
 @task
 def save_output(df: pd.DataFrame, original_filename: str):
-    base_name = os.path.splitext(original_filename)[0]
-    output_filename = f"processed_{base_name}.csv"
+    output_filename = output_filename_for(original_filename)
     print(f"Saving Output: {output_filename}...")
     
     csv_buffer = io.StringIO()
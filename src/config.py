@@ -1,5 +1,6 @@
 import os
-import json
+import orjson
+from pathlib import PurePosixPath
 from dotenv import load_dotenv
 
 # Path Definitions
@@ -23,8 +24,8 @@ def load_required_fields():
     """Load the standardized fields definition from JSON."""
     fields_path = os.path.join(DATA_DIR, "standardized_fields.json")
     if os.path.exists(fields_path):
-        with open(fields_path, "r") as f:
-            return json.load(f)
+        with open(fields_path, "rb") as f:
+            return orjson.loads(f.read())
     else:
         # Fallback or Error
         print(f"Configuration file not found: {fields_path}")
@@ -35,6 +36,10 @@ BUCKET_INPUT = "input"
 BUCKET_MAPPING = "mapping"
 BUCKET_OUTPUT = "output"
 
+def output_filename_for(original_filename):
+    """Name of the processed CSV the mapping flow writes to BUCKET_OUTPUT for an upload."""
+    return f"processed_{PurePosixPath(original_filename).stem}.csv"
+
 # Exported Constants
 REQUIRED_FIELDS = load_required_fields()
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
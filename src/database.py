@@ -1,5 +1,7 @@
 import os
 import sys
+import base64
+import requests
 from supabase import create_client, Client, ClientOptions
 from src.config import load_environment
 from datetime import datetime
@@ -56,6 +58,55 @@ def get_supabase_client() -> Client:
     client: Client = create_client(SUPABASE_URL, SUPABASE_KEY, options=opts)
     return client
 
+# Supabase's resumable (TUS) endpoint only accepts 6 MB chunks (last one may be shorter)
+RESUMABLE_CHUNK_SIZE = 6 * 1024 * 1024
+
+def upload_resumable(bucket: str, path: str, fileobj, size: int, content_type: str, max_retries: int = 3) -> None:
+    """
+    Uploads a file through Supabase Storage's resumable (TUS) endpoint in 6 MB chunks.
+    A failed chunk is resumed from the offset the server confirmed instead of
+    restarting the whole upload. Raises requests.HTTPError if retries run out.
+    """
+    endpoint = f"{SUPABASE_URL}/storage/v1/upload/resumable"
+    headers = {
+        "authorization": f"Bearer {SUPABASE_KEY}",
+        "apikey": SUPABASE_KEY,
+        "tus-resumable": "1.0.0",
+    }
+    metadata = {"bucketName": bucket, "objectName": path, "contentType": content_type}
+
+    with requests.Session() as session:
+        res = session.post(endpoint, headers={
+            **headers,
+            "upload-length": str(size),
+            "upload-metadata": ",".join(f"{k} {base64.b64encode(v.encode()).decode()}" for k, v in metadata.items()),
+        }, timeout=60)
+        res.raise_for_status()
+        upload_url = res.headers["location"]
+
+        offset = 0
+        retries = 0
+        while offset < size:
+            fileobj.seek(offset)
+            chunk = fileobj.read(RESUMABLE_CHUNK_SIZE)
+            try:
+                res = session.patch(upload_url, data=chunk, headers={
+                    **headers,
+                    "upload-offset": str(offset),
+                    "content-type": "application/offset+octet-stream",
+                }, timeout=600)
+                res.raise_for_status()
+                offset = int(res.headers["upload-offset"])
+                retries = 0
+            except requests.RequestException:
+                retries += 1
+                if retries > max_retries:
+                    raise
+                # Ask the server how much it actually kept, then continue from there
+                head = session.head(upload_url, headers=headers, timeout=60)
+                head.raise_for_status()
+                offset = int(head.headers["upload-offset"])
+
 def get_existing_billboard_ids(billboard_ids: list) -> set:
     """
     Check which billboard IDs already exist in MongoDB.
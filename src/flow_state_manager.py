@@ -7,6 +7,7 @@ Allows flows to save their progress and resume from the last checkpoint.
 
 import json
 import os
+import functools
 from pathlib import Path
 from typing import Dict, Any, Optional
 from datetime import datetime
@@ -16,8 +17,9 @@ BASE_DIR = Path(__file__).parent.parent
 STATE_DIR = BASE_DIR / "config" / "flow_states"
 
 
+@functools.cache
 def ensure_state_dir():
-    """Ensure the state directory exists."""
+    """Ensure the state directory exists (created at most once per process)."""
     STATE_DIR.mkdir(parents=True, exist_ok=True)
 
 
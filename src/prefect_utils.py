@@ -8,6 +8,7 @@ enabling reconnection to running flows after Streamlit page refresh.
 import os
 import json
 import asyncio
+import functools
 from datetime import datetime
 from typing import Optional, Dict, Any
 from pathlib import Path
@@ -17,6 +18,12 @@ BASE_DIR = Path(__file__).parent.parent
 FLOW_STATE_FILE = BASE_DIR / "config" / "active_flow_run.json"
 
 
+@functools.cache
+def _ensure_state_dir() -> None:
+    """Create the flow state directory once per process."""
+    FLOW_STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+
+
 def save_flow_run_state(flow_run_id: str, input_csv_path: str, output_json_path: str, 
                          total_records: int, started_at: str = None) -> None:
     """
@@ -39,7 +46,7 @@ def save_flow_run_state(flow_run_id: str, input_csv_path: str, output_json_path:
     }
     
     # Ensure config directory exists
-    FLOW_STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    _ensure_state_dir()
     
     with open(FLOW_STATE_FILE, 'w', encoding='utf-8') as f:
         json.dump(state, f, indent=2)
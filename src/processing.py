@@ -1,9 +1,25 @@
 import pandas as pd
 import numpy as np
 import re
+import codecs
 from geopy.geocoders import Nominatim
 from geopy.extra.rate_limiter import RateLimiter
 
+try:
+    from charset_normalizer import from_bytes as detect_charset
+except ImportError:  # optional; detect_encoding falls back to cp1252 for non-utf-8 samples
+    detect_charset = None
+
+try:
+    import python_calamine  # noqa: F401  (only checked for; pandas loads it)
+    # Rust-backed reader: streams the sheet instead of building openpyxl's cell tree, and reads .xls too
+    EXCEL_ENGINE = "calamine"
+except ImportError:  # optional; pandas picks its default engine (openpyxl for .xlsx)
+    EXCEL_ENGINE = None
+
+# Bytes sniffed for encoding detection; enough for a reliable guess without scanning the file
+ENCODING_SAMPLE_BYTES = 64 * 1024
+
 # --- HELPER FUNCTIONS ---
 
 def clean_numeric(val):
@@ -13,6 +29,32 @@ def clean_numeric(val):
     match = re.search(r'(\d+(\.\d+)?)', s)
     return float(match.group(1)) if match else np.nan
 
+def detect_encoding(sample):
+    """
+    Best-guess text encoding of a CSV byte sample, or None for an empty sample.
+    Cheap checks first (BOM, strict utf-8), statistical detection only for the rest.
+    """
+    if not sample:
+        return None
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    try:
+        sample.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError as e:
+        # A full-size sample may be cut mid-character (at most 3 bytes of a utf-8 sequence);
+        # a shorter sample is the whole file, so an incomplete tail there rules utf-8 out
+        if (e.reason == 'unexpected end of data' and len(sample) == ENCODING_SAMPLE_BYTES
+                and e.start >= len(sample) - 3):
+            return 'utf-8'
+    if detect_charset is not None:
+        best = detect_charset(sample).best()
+        if best is not None:
+            return best.encoding
+    return 'cp1252'
+
 def parse_coord_string(val):
     """Splits '77.60, 12.95' into (12.95, 77.60)."""
     if pd.isna(val) or str(val).strip() in ['', '0,0', '0', 'nan']: 
@@ -2,8 +2,10 @@ import streamlit as st
 import os
 import sys
 
-# Add parent directory to path
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Add parent directory to path (once - Streamlit re-executes this script on every rerun)
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
 
 st.set_page_config(
     page_title="Billboard Pipeline Home",
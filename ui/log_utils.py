@@ -2,6 +2,16 @@ import re
 from datetime import datetime
 from typing import List, Dict, Optional
 
+# UI color per log level; anything else (DEBUG, RAW, ...) is gray
+LEVEL_COLORS = {
+    "INFO": "#3498db",     # Blue
+    "WARNING": "#f39c12",  # Orange
+    "ERROR": "#e74c3c",    # Red
+    "CRITICAL": "#e74c3c", # Red
+    "SUCCESS": "#2ecc71",  # Green
+}
+DEFAULT_LEVEL_COLOR = "#95a5a6" # Gray
+
 class LogParser:
     """
     Parses raw log lines into structured data.
@@ -12,73 +22,76 @@ class LogParser:
     # Group 2: Level
     # Group 3: Source (broadly)
     # Group 4: Message
-    LOG_PATTERN = re.compile(r"^(\d{2}:\d{2}:\d{2}\.\d{3})\s+\|\s+([A-Z]+)\s+\|\s+(.*?)\s+-\s+(.*)$")
+    # Applied with MULTILINE to one joined buffer; [^\S\n] is whitespace that can't run onto the next line,
+    # and the message must end in a non-space (as when matching an rstripped line)
+    LOG_PATTERN = re.compile(
+        r"^(\d{2}:\d{2}:\d{2}\.\d{3})[^\S\n]+\|[^\S\n]+([A-Z]+)[^\S\n]+\|[^\S\n]+(.*?)[^\S\n]+-[^\S\n]+(.*\S)[^\S\n]*$",
+        re.MULTILINE,
+    )
 
     @staticmethod
-    def parse_logs(log_lines: List[str]) -> List[Dict[str, str]]:
+    def parse_logs(log_lines: List[str], current_entry: Optional[Dict[str, str]] = None) -> List[Dict[str, str]]:
         """
         Parses a list of raw log strings into a structured list of dictionaries.
         Handling multi-line logs by attaching them to the previous entry's details.
+        The lines are joined once and scanned with finditer, so the regex engine
+        walks the log instead of a Python loop per line.
+        Pass the last entry of an earlier call as current_entry to parse incrementally:
+        leading continuation lines are attached to it (in place) and only new entries are returned.
         """
+        text = "\n".join(log_lines)
         structured_logs = []
-        current_entry = None
+        pos = 0
+        if current_entry is not None and current_entry["level"] == "RAW":
+            # Orphans before the first real entry stay separate RAW entries, as in a single pass
+            current_entry = None
+
+        for match in LogParser.LOG_PATTERN.finditer(text):
+            # Anything between two entries is continuation text (e.g. Traceback)
+            LogParser._attach_continuation(text[pos:match.start()], current_entry, structured_logs)
+
+            # New Log Entry
+            timestamp, level, source, message = match.groups()
+            current_entry = {
+                "timestamp": timestamp,
+                "level": level.strip(),
+                "source": source.strip(),
+                "message": message.strip(),
+                "details": "" # For multi-line stack traces etc.
+            }
+            structured_logs.append(current_entry)
+            pos = match.end()
+
+        # Trailing continuation of the last entry
+        LogParser._attach_continuation(text[pos:], current_entry, structured_logs)
+
+        return structured_logs
 
-        for line in log_lines:
+    @staticmethod
+    def _attach_continuation(chunk: str, current_entry: Optional[Dict[str, str]], structured_logs: List[Dict[str, str]]) -> None:
+        """Adds non-entry lines to the current entry's details (or as RAW entries before the first entry)."""
+        for line in chunk.split("\n"):
             line = line.rstrip()
             if not line:
                 continue
 
-            match = LogParser.LOG_PATTERN.match(line)
-            if match:
-                # New Log Entry
-                timestamp, level, source, message = match.groups()
-                
-                # Save previous entry if exists
-                if current_entry:
-                    structured_logs.append(current_entry)
-                
-                current_entry = {
-                    "timestamp": timestamp,
-                    "level": level.strip(),
-                    "source": source.strip(),
-                    "message": message.strip(),
-                    "details": "" # For multi-line stack traces etc.
-                }
-            else:
-                # Continuation of previous entry (e.g. Traceback)
-                if current_entry:
-                    if current_entry["details"]:
-                        current_entry["details"] += "\n" + line
-                    else:
-                        current_entry["details"] = line
+            if current_entry:
+                if current_entry["details"]:
+                    current_entry["details"] += "\n" + line
                 else:
-                    # Orphaned line at start, treat as raw info or separate entry
-                    # Ideally shouldn't happen if logs start clean, but safe fallback:
-                    structured_logs.append({
-                        "timestamp": "",
-                        "level": "RAW",
-                        "source": "System",
-                        "message": line,
-                        "details": ""
-                    })
-
-        # Append the last entry
-        if current_entry:
-            structured_logs.append(current_entry)
-
-        return structured_logs
+                    current_entry["details"] = line
+            else:
+                # Orphaned line at start, treat as raw info or separate entry
+                # Ideally shouldn't happen if logs start clean, but safe fallback:
+                structured_logs.append({
+                    "timestamp": "",
+                    "level": "RAW",
+                    "source": "System",
+                    "message": line,
+                    "details": ""
+                })
 
     @staticmethod
     def get_color_for_level(level: str) -> str:
         """Returns a hex color code suitable for the UI based on log level."""
-        level = level.upper()
-        if level == "INFO":
-            return "#3498db" # Blue
-        elif level == "WARNING":
-            return "#f39c12" # Orange
-        elif level == "ERROR" or level == "CRITICAL":
-            return "#e74c3c" # Red
-        elif level == "SUCCESS":
-             return "#2ecc71" # Green
-        else:
-            return "#95a5a6" # Gray
+        return LEVEL_COLORS.get(level.upper(), DEFAULT_LEVEL_COLOR)
@@ -0,0 +1,48 @@
+import functools
+
+# Pure helpers for the column-mapping UI. They live outside the page script because
+# Streamlit re-executes the page into a fresh namespace on every rerun, which would
+# empty a page-level lru_cache; this module is imported once per server process,
+# so its caches do survive reruns.
+
+# Column-name normalisation for alias matching: spaces -> underscores, dots dropped
+COLUMN_CLEAN_TABLE = str.maketrans({' ': '_', '.': None})
+
+@functools.lru_cache(maxsize=16)
+def column_options(source_columns):
+    """
+    Selectbox option lists for an upload's columns, sorted once per upload.
+    Returns (sorted_source, base, auto, custom, sorted_position); the lists are shared, don't mutate them.
+    """
+    sorted_source = sorted(source_columns)
+    col_options_base = ["(Select Column)"] + sorted_source
+    col_options_auto = ["(Select Column)", "(Auto Calculate)"] + sorted_source
+    col_options_custom = ["(Select Column)", "(Manual Input)"] + sorted_source
+    # Position of each column within sorted_source (first wins on duplicate headers)
+    sorted_position = {}
+    for pos, raw_col in enumerate(sorted_source):
+        sorted_position.setdefault(raw_col, pos)
+    return sorted_source, col_options_base, col_options_auto, col_options_custom, sorted_position
+
+@functools.lru_cache(maxsize=16)
+def cleaned_column_names(source_columns):
+    """Alias-matching form of each header (lowercase, spaces -> underscores, no dots), once per upload."""
+    return tuple(str(raw_col).lower().translate(COLUMN_CLEAN_TABLE) for raw_col in source_columns)
+
+@functools.lru_cache(maxsize=4096)
+def default_source_column(source_columns, key, aliases):
+    """
+    Source column to pre-select for a standard field: the exact key if present,
+    else the first column whose cleaned name contains an alias. None if no match.
+    Arguments are tuples/strings so results persist across reruns of the same upload.
+    """
+    if key in source_columns:
+        return key
+    if not aliases:
+        return None
+    cleaned = cleaned_column_names(source_columns)
+    for alias in aliases:
+        for clean_col, raw_col in zip(cleaned, source_columns):
+            if alias in clean_col:
+                return raw_col
+    return None
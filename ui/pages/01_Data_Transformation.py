@@ -1,13 +1,21 @@
 import streamlit as st
 import pandas as pd
+import io
 import os
-import json
+import re
+import hashlib
+import orjson
 import uuid
 import sys
 import subprocess
 import time
+import tempfile
+import queue
+import collections
+import threading
 from datetime import datetime
-import altair as alt
+from pathlib import PurePosixPath
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 # --- Import from SRC ---
@@ -16,53 +24,410 @@ from dotenv import load_dotenv
 # Dirname 1: .../ui/pages
 # Dirname 2: .../ui
 # Dirname 3: .../ (ROOT)
-sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+# Guarded so Streamlit reruns don't keep growing sys.path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
 
-from src.config import REQUIRED_FIELDS, BUCKET_INPUT, BUCKET_MAPPING, BUCKET_OUTPUT, load_required_fields
-from src.database import get_supabase_client
+from src.config import REQUIRED_FIELDS, BUCKET_INPUT, BUCKET_MAPPING, BUCKET_OUTPUT, output_filename_for
+from src.database import get_supabase_client, upload_resumable, RESUMABLE_CHUNK_SIZE
+from src.processing import detect_encoding, ENCODING_SAMPLE_BYTES, EXCEL_ENGINE
+
+@st.cache_resource(show_spinner=False)
+def get_cached_supabase_client():
+    """One Supabase client (and its HTTP connection pool) per server process, reused across reruns."""
+    return get_supabase_client()
 
 # Initialize Supabase
-supabase = get_supabase_client()
+supabase = get_cached_supabase_client()
+
+# Prefect prints "View at <url>" once the flow run is created
+PREFECT_URL_PATTERN = re.compile(r"View at (https?://[^\s]+)")
+
+# The flow logs "Saving Output: <filename>..." right before uploading its result
+SAVING_OUTPUT_PATTERN = re.compile(r"Saving Output:\s*(.*?)(?:\.\.\.|$)")
+
+# Terminal color/cursor sequences (e.g. from Prefect's console handler), matched on raw bytes
+ANSI_ESCAPE_PATTERN = re.compile(rb"\x1b\[[0-9;?]*[A-Za-z]")
+
+# Pipeline Steps for Tracking Progress (step marker -> progress bar percent)
+STEP_PROGRESS = {
+    "Step 1": 15,
+    "Step 2": 30,
+    "Step 3": 50,
+    "Step 4": 70,
+    "Step 5": 85,
+    "Saving Output": 95
+}
+
+# Minimum seconds between Live Issues redraws caused by retry lines
+ISSUE_REDRAW_INTERVAL = 0.25
+
+# Minimum seconds between live log panel redraws
+LOG_REDRAW_INTERVAL = 0.5
+
+# Minimum seconds between live timeline chart redraws
+GANTT_REDRAW_INTERVAL = 0.5
 
-# Re-load fields dynamically if needed or use imported constant
-REQUIRED_FIELDS = load_required_fields()
+# Any line the monitor reacts to, classified in one scan by named group:
+# issue (Live Issues panel), url (Prefect run link), step (step markers), saving (output filename).
+# Everything else only goes to the log panel.
+LOG_EVENT_PATTERN = re.compile(
+    r"(?P<issue>WARNING|ERROR|Retrying|Exception)|(?P<url>View at https)|(?P<step>>>> Step)|(?P<saving>Saving Output)"
+)
+
+# Rows parsed for the mapping UI; the full file is only parsed when downloads are requested
+PREVIEW_ROWS = 1000
+
+# Flow output lines kept for the final log panel render; older lines are dropped so long runs stay
+# bounded in memory (the downloadable log keeps every line, spooled to disk)
+LOG_HISTORY_LINES = 2000
+
+# Lines the reader thread may queue ahead of the monitor loop; when full it blocks, and the pipe backpressures the flow
+LOG_QUEUE_MAX_LINES = 1000
+
+# Parsed entries kept for the live log panel (it shows the most recent ones)
+LIVE_LOG_ENTRIES = 50
+
+# Fixed markup of the live log panel; only the per-entry values are formatted in render_logs
+LOG_PANEL_OPEN = "<div style='font-family:monospace; font-size:12px; line-height:1.4;'>"
+LOG_ROW_OPEN = "<div style='border-bottom: 1px solid #333; padding: 2px 0;'>"
+LOG_LEVEL_STYLE = "font-weight:bold; margin-right:8px; min-width:60px; display:inline-block;"
+LOG_DETAILS_OPEN = "<div style='background:#1e1e1e; color:#e74c3c; padding:4px; margin-top:2px; white-space:pre-wrap;'>"
+
+# Export buffers above this size spill to a temp file instead of staying in memory
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+# Lifetime (seconds) of the signed link offered for downloading a processed file
+OUTPUT_LINK_EXPIRY = 3600
 
 # --- NEW: Helper to Load Validation Schema ---
+@st.cache_resource(show_spinner=False)
 def load_validation_schema():
-    """Loads the output validation schema from config folder."""
+    """Loads the output validation schema from config folder (read once per server process)."""
     base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     config_path = os.path.join(base_dir, "config", "output_validation.json")
     
     if os.path.exists(config_path):
-        with open(config_path, 'r') as f:
-            return json.load(f)
+        with open(config_path, 'rb') as f:
+            return orjson.loads(f.read())
     return None
 
-def save_uploaded_file_to_supabase(uploaded_file):
-    # 1. single source of identity: epoch milliseconds
+def read_csv_fast(source, **kwargs):
+    """
+    Reads a CSV with the multithreaded pyarrow engine and Arrow-backed dtypes.
+    Falls back to the default C engine for files/options pyarrow can't handle;
+    either way the columns come back Arrow-backed.
+    """
+    kwargs.setdefault('dtype_backend', 'pyarrow')
+    # pyarrow has no nrows support; bounded preview reads go straight to the C engine
+    if kwargs.get('nrows') is None:
+        try:
+            return pd.read_csv(source, engine='pyarrow', **kwargs)
+        except Exception:
+            source.seek(0)
+    return pd.read_csv(source, **kwargs)
+
+def read_uploaded_file(uploaded_file, nrows=None):
+    """
+    Parses an uploaded CSV/Excel file and strips whitespace from the headers.
+    Pass nrows to read only the first rows (mapping UI preview).
+    Cached per upload, so widget reruns don't re-parse the file.
+    """
+    return _parse_upload(uploaded_file.file_id, nrows, _uploaded_file=uploaded_file)
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _parse_upload(file_id, nrows, _uploaded_file):
+    # Keyed on Streamlit's per-upload file_id; the underscore arg is excluded
+    # from hashing so the file bytes are never re-hashed on a rerun.
+    uploaded_file = _uploaded_file
+    uploaded_file.seek(0)
+    if uploaded_file.name.lower().endswith(('.xlsx', '.xls')):
+        df = pd.read_excel(uploaded_file, nrows=nrows, dtype_backend='pyarrow', engine=EXCEL_ENGINE)
+    else:
+        # Sniff the encoding once so non-UTF-8 files are parsed in a single pass;
+        # the cp1252 retry only remains for samples that guessed wrong
+        with uploaded_file.getbuffer() as view:
+            encoding = detect_encoding(bytes(view[:ENCODING_SAMPLE_BYTES])) or 'utf-8'
+        try:
+            df = read_csv_fast(uploaded_file, nrows=nrows, encoding=encoding)
+        except UnicodeDecodeError:
+            uploaded_file.seek(0)
+            df = read_csv_fast(uploaded_file, encoding='cp1252', nrows=nrows)
+
+    # Headers are stripped once here, inside the cache boundary
+    df.rename(columns=lambda c: c.strip(), inplace=True)
+    return df
+
+def build_mapped_frame(df, rename_map, static_map, keep_columns):
+    """
+    Applies the column mapping to a parsed upload (rename, static values, numeric coercion)
+    and returns only the kept columns. The frame is projected to the mapped source
+    columns first, so unmapped columns are never copied.
+    """
+    # Static values are added in one assign() rather than one insert per column
+    df_final = df[[c for c in rename_map if c in df.columns]].rename(columns=rename_map).assign(**static_map)
+
+    # Custom Columns Numeric Cleaning (width_ft, height_ft)
+    # If these came from custom columns (static or mapped), ensure they are numeric
+    numeric_fields = ['width_ft', 'height_ft', 'base_rate_per_month', 'base_rate_per_unit', 'card_rate_per_month', 'card_rate_per_unit']
+    for nf in numeric_fields:
+        if nf in df_final.columns:
+            # Force to numeric, coerce errors to NaN
+            df_final[nf] = pd.to_numeric(df_final[nf], errors='coerce')
+    return df_final[[c for c in keep_columns if c in df_final.columns]]
+
+def build_final_mapping(rename_mapping, static_mapping, custom_column_data):
+    """
+    Merges the standard-field mapping with the custom column rows.
+    Returns (rename_mapping, static_mapping, keep_columns); keep_columns is
+    de-duplicated in mapping order. Shared by the preview and the saved config.
+    """
+    final_rename_map = rename_mapping.copy()
+    final_static_map = static_mapping.copy()
+    keep_columns = list(rename_mapping.values())
+
+    for t_name, s_sel, m_val in custom_column_data:
+        clean_target = t_name.strip()
+        if not clean_target: continue
+        if s_sel == "(Manual Input)":
+            final_static_map[clean_target] = m_val
+            keep_columns.append(clean_target)
+        elif s_sel != "(Select Column)":
+            final_rename_map[s_sel] = clean_target
+            keep_columns.append(clean_target)
+
+    return final_rename_map, final_static_map, list(dict.fromkeys(keep_columns))
+
+def mapping_signature(file_id, rename_map, static_map, keep_columns):
+    """
+    Hashable fingerprint of an upload + mapping. Reruns where it is unchanged
+    (e.g. toggling an unrelated widget) reuse the previously built artifacts.
+    """
+    return hash((file_id, tuple(rename_map.items()), tuple(static_map.items()), tuple(keep_columns)))
+
+def to_arrow_table(df):
+    """
+    Converts a DataFrame to an Arrow table (for the preview grid and the Excel writer).
+    Returns None for frames Arrow can't convert (e.g. mixed-type object columns).
+    """
+    # Export-only dependencies are imported on first use, keeping them off the page's startup path
+    import pyarrow as pa
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except Exception:
+        return None
+
+def dataframe_to_csv_bytes(df):
+    """
+    Serializes a DataFrame to UTF-8 CSV bytes with pandas' writer.
+    Arrow's writer is not used: it quotes every string cell and formats floats/booleans
+    differently (10.0 -> 10, True -> true), which would change the downloaded file.
+    """
+    # Written straight to bytes; large files are assembled on disk rather than as one str
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as buffer:
+        df.to_csv(buffer, index=False, encoding='utf-8')
+        buffer.seek(0)
+        return buffer.read()
+
+def dataframe_to_xlsx_bytes(df, table=None):
+    """
+    Serializes a DataFrame to .xlsx bytes with openpyxl's write-only mode,
+    which streams rows out instead of building the whole cell grid in memory.
+    """
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet1")
+    ws.append(list(df.columns))
+
+    if table is not None:
+        # Arrow batches yield plain Python values (None for nulls)
+        for batch in table.to_batches():
+            for row in zip(*(column.to_pylist() for column in batch.columns)):
+                ws.append(row)
+    else:
+        for row in df.astype(object).where(df.notna(), None).itertuples(index=False, name=None):
+            ws.append(row)
+
+    # Large workbooks are assembled on disk, so only the returned bytes live in memory
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as buffer:
+        wb.save(buffer)
+        buffer.seek(0)
+        return buffer.read()
+
+def compute_run_key(file_bytes, run_mapping):
+    """
+    Content hash of the uploaded file + mapping.
+    Identical keys mean the pipeline would produce the same output.
+    """
+    digest = hashlib.blake2b(file_bytes, digest_size=16)
+    digest.update(orjson.dumps(run_mapping, option=orjson.OPT_SORT_KEYS))
+    return digest.hexdigest()
+
+def extract_prefect_url(text):
+    """Returns the Prefect run URL from a 'View at ...' log line, or None."""
+    match = PREFECT_URL_PATTERN.search(text)
+    return match.group(1).rstrip('.') if match else None
+
+# Vega-Lite spec for the execution timeline. Built by hand rather than through
+# Altair, whose encoder and schema validation dominated every redraw.
+GANTT_SPEC = {
+    "mark": "bar",
+    "width": "container",
+    "height": 200,
+    "encoding": {
+        "x": {"field": "Start", "type": "temporal", "title": "Time", "axis": {"format": "%H:%M:%S"}},
+        "x2": {"field": "End"},
+        "y": {"field": "Task", "type": "nominal", "sort": None, "title": None},  # Keep insertion order
+        "color": {
+            "field": "Status", "type": "nominal",
+            "scale": {"domain": ["Running", "Completed", "Failed"], "range": ["#3498db", "#2ecc71", "#e74c3c"]},
+        },
+        "tooltip": [
+            {"field": "Task", "type": "nominal"},
+            {"field": "Start", "type": "temporal", "format": "%H:%M:%S"},
+            {"field": "End", "type": "temporal", "format": "%H:%M:%S"},
+            {"field": "Status", "type": "nominal"},
+        ],
+    },
+}
+
+def gantt_chart_spec(task_events, title):
+    """Timeline spec for the given task events ({Task, Start, End, Status} dicts with datetime bounds)."""
+    # Epoch milliseconds: Vega-Lite reads numbers on a temporal field directly, no date-string parsing
+    values = [
+        {**event, "Start": int(event["Start"].timestamp() * 1000), "End": int(event["End"].timestamp() * 1000)}
+        for event in task_events
+    ]
+    return {**GANTT_SPEC, "title": title, "data": {"values": values}}
+
+def drain_stream(stream, line_queue, chunk_size=65536):
+    """
+    Copies a binary subprocess pipe into a queue line by line; None marks the end of the stream.
+    Reads whatever the pipe holds (up to chunk_size) per syscall and decodes each batch of
+    complete lines once, rather than a readline() + decode per line.
+    """
+    fd = stream.fileno()
+    pending = b""
+    try:
+        while True:
+            chunk = os.read(fd, chunk_size)
+            if not chunk:
+                break
+            # Split on the last newline only; a partial trailing line waits for the next chunk
+            complete, newline, pending = (pending + chunk).rpartition(b"\n")
+            if newline:
+                # Color codes would break the log/step parsing; strip them once per chunk
+                complete = ANSI_ESCAPE_PATTERN.sub(b"", complete)
+                for line in complete.decode("utf-8", "replace").splitlines():
+                    line_queue.put(line)
+        for line in ANSI_ESCAPE_PATTERN.sub(b"", pending).decode("utf-8", "replace").splitlines():
+            line_queue.put(line)
+    finally:
+        line_queue.put(None)
+
+def next_log_batch(line_queue, wait=0.1, max_lines=200):
+    """
+    Waits up to `wait` seconds for a line, then takes whatever else is already queued.
+    Returns an empty list if nothing arrived in time.
+    """
+    try:
+        batch = [line_queue.get(timeout=wait)]
+    except queue.Empty:
+        return []
+    while len(batch) < max_lines and batch[-1] is not None:
+        try:
+            batch.append(line_queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+def render_output_download(output_filename):
+    """Offers a processed file via a signed link, so the browser downloads it straight from storage."""
+    try:
+        st.write("---")
+        st.subheader("📥 Download Results")
+        with st.spinner(f"Preparing download link: {output_filename}..."):
+            signed = supabase.storage.from_(BUCKET_OUTPUT).create_signed_url(
+                output_filename, OUTPUT_LINK_EXPIRY, options={"download": output_filename}
+            )
+            url = signed.get("signedURL") or signed.get("signedUrl")
+
+            col_dl1, col_dl2 = st.columns([1, 1])
+            with col_dl1:
+                st.link_button("📥 Download Processed File (CSV)", url=url, type="primary")
+            st.success(f"File ready for download! The link is valid for {OUTPUT_LINK_EXPIRY // 60} minutes.")
+    except Exception as e:
+        st.error(f"Error fetching output file `{output_filename}`: {str(e)}")
+        st.warning("Please check your Supabase 'output' bucket to verify if the file was saved.")
+
+def storage_object_exists(bucket, name):
+    """Checks whether an object with this exact name is already in the bucket."""
+    existing = supabase.storage.from_(bucket).list(options={"search": name})
+    return any(item.get("name") == name for item in existing)
+
+def save_mapping_config(mapping_filename, config_bytes):
+    """
+    Uploads a run's mapping config. The name carries the run key (file + mapping hash),
+    so an object with that name always holds identical bytes: upserting is safe, and
+    concurrent identical runs can't fail on a duplicate. Configs of other mappings are
+    never touched.
+    """
+    supabase.storage.from_(BUCKET_MAPPING).upload(
+        path=mapping_filename,
+        file=config_bytes,
+        file_options={"content-type": "application/json", "upsert": "true"}
+    )
+
+def stored_input_filename(uploaded_file):
+    """
+    Storage name for an upload: content hash + original name, so re-submitting
+    identical bytes maps to the same object. Known before the upload starts.
+    """
+    # getbuffer() is a view over Streamlit's in-memory upload, no copy
+    with uploaded_file.getbuffer() as view:
+        content_hash = hashlib.blake2b(view, digest_size=8).hexdigest()
+    return f"{content_hash}_{uploaded_file.name}"
+
+def save_uploaded_file_to_supabase(uploaded_file, stored_filename):
+    # 1. upload timestamp (identity comes from the content-hashed stored_filename)
     upload_uid = int(time.time() * 1000)
 
-    # 2. derive filenames
+    # 2. derive metadata
     original_filename = uploaded_file.name
     file_ext = original_filename.split('.')[-1].lower()
-    stored_filename = f"{upload_uid}_{original_filename}"
 
-    # 3. read bytes
-    file_bytes = uploaded_file.getvalue()
+    # Already uploaded (and recorded) earlier: skip the network transfer
+    if storage_object_exists(BUCKET_INPUT, stored_filename):
+        return stored_filename
 
-    # 4. upload to Supabase Storage
-    supabase.storage.from_(BUCKET_INPUT).upload(
-        path=stored_filename,
-        file=file_bytes,
-        file_options={"content-type": uploaded_file.type}
-    )
+    # 3. upload to Supabase Storage
+    if uploaded_file.size > RESUMABLE_CHUNK_SIZE:
+        # Large files go through the resumable endpoint so a dropped connection
+        # only costs the current 6 MB chunk, not the whole transfer
+        upload_resumable(BUCKET_INPUT, stored_filename, uploaded_file, uploaded_file.size,
+                         uploaded_file.type or "application/octet-stream")
+    else:
+        # Streamed from the upload buffer rather than a getvalue() copy
+        # (storage3 only streams BufferedReader-like files)
+        uploaded_file.seek(0)
+        reader = io.BufferedReader(uploaded_file)
+        try:
+            supabase.storage.from_(BUCKET_INPUT).upload(
+                path=stored_filename,
+                file=reader,
+                file_options={"content-type": uploaded_file.type}
+            )
+        finally:
+            # Detach so the reader doesn't close the UploadedFile when collected
+            reader.detach()
 
-    # 5. public URL
+    # 4. public URL
     public_url = supabase.storage.from_(BUCKET_INPUT).get_public_url(
         stored_filename
     )
 
-    # 6. persist ingestion metadata (atomic truth)
+    # 5. persist ingestion metadata (atomic truth)
     supabase.table("uploaded_files").insert({
         "upload_timestamp": upload_uid,
         "original_filename": original_filename,
@@ -77,17 +442,23 @@ def save_uploaded_file_to_supabase(uploaded_file):
 
     return stored_filename
 
-# --- NEW: Import LogParser ---
+# --- NEW: Import LogParser and the mapping helpers ---
+# (module-level caches in these imported modules persist across reruns, unlike ones defined in this script)
 try:
     from ui.log_utils import LogParser
+    from ui.mapping_utils import column_options, default_source_column
 except ImportError:
     # If running from pages, ui module should be importable if root is in path
     try:
         from ui.log_utils import LogParser
+        from ui.mapping_utils import column_options, default_source_column
     except:
         # Fallback manual path add
-        sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        UI_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        if UI_DIR not in sys.path:
+            sys.path.append(UI_DIR)
         from log_utils import LogParser
+        from mapping_utils import column_options, default_source_column
 
 def main():
     st.set_page_config(page_title="Data Transformation", layout="wide")
@@ -97,9 +468,9 @@ def main():
         st.write(f" Storage: Supabase")
         st.write(f" Buckets: `{BUCKET_INPUT}`, `{BUCKET_MAPPING}`, `{BUCKET_OUTPUT}`")
 
-    # Initialize session state for custom columns
+    # Initialize session state for custom columns ({row_id: row_state})
     if "custom_columns" not in st.session_state:
-        st.session_state.custom_columns = []
+        st.session_state.custom_columns = {}
 
     # 1. CSV Upload
     st.header("1. Upload Data")
@@ -107,29 +478,20 @@ def main():
 
     if uploaded_file is not None:
         try:
-            uploaded_file.seek(0)
-            if uploaded_file.name.lower().endswith(('.xlsx', '.xls')):
-                df = pd.read_excel(uploaded_file)
-            else:
-                try:
-                    df = pd.read_csv(uploaded_file)
-                except UnicodeDecodeError:
-                    uploaded_file.seek(0)
-                    df = pd.read_csv(uploaded_file, encoding='cp1252')
-            
-            st.success(f"Loaded {len(df)} rows.")
+            # Only the first rows are needed to build the mapping UI; the pipeline
+            # re-reads the raw upload from Supabase, so no full parse happens here.
+            df = read_uploaded_file(uploaded_file, nrows=PREVIEW_ROWS)
             
-            # Clean headers
-            df.columns = [c.strip() for c in df.columns]
+            st.success(f"Loaded `{uploaded_file.name}` (previewing the first {len(df)} rows).")
             
             with st.expander("Preview Data"):
                 st.dataframe(df.head())
             
             source_columns = df.columns.tolist()
-            # Column Selection Options
-            # Define two sets of options:
-            col_options_base = ["(Select Column)"] + sorted(source_columns)
-            col_options_auto = ["(Select Column)", "(Auto Calculate)"] + sorted(source_columns)
+            source_cols_key = tuple(source_columns)
+            # Column Selection Options for every selectbox (standard + custom rows); column_options is
+            # cached in ui/mapping_utils.py, so later reruns of the same upload don't sort again
+            sorted_source, col_options_base, col_options_auto, col_options_custom, sorted_position = column_options(source_cols_key)
             
             # 2. Column Mapping
             st.header("2. Map Columns")
@@ -146,21 +508,11 @@ def main():
             
             # Helper for auto-mapping
             def get_default_index(key, conf, options_list):
-                if key in source_columns:
-                    try:
-                        return options_list.index(key)
-                    except ValueError:
-                        return 0
-                if 'aliases' in conf:
-                    for alias in conf['aliases']:
-                        for raw_col in source_columns:
-                            clean_col = str(raw_col).lower().replace(' ', '_').replace('.', '')
-                            if alias in clean_col:
-                                try:
-                                    return options_list.index(raw_col)
-                                except ValueError:
-                                    continue
-                return 0
+                match = default_source_column(source_cols_key, key, tuple(conf.get('aliases', ())))
+                if match is None:
+                    return 0
+                # Every options list is a fixed prefix followed by sorted_source
+                return len(options_list) - len(sorted_source) + sorted_position[match]
 
             # Layout tracking
             layout_idx = 0
@@ -328,28 +680,35 @@ def main():
             st.subheader("Custom Columns")
             
             if st.button("+ Add Custom Column"):
-                st.session_state.custom_columns.append({"id": str(uuid.uuid4())})
+                st.session_state.custom_columns[str(uuid.uuid4())] = {}
             
             custom_column_data = [] # List of (target_name, source_selection, manual_value)
             
-            for idx, c_item in enumerate(st.session_state.custom_columns):
+            # Widget keys are derived from the row id, so deleting a row leaves
+            # the state of the remaining rows untouched.
+            for idx, c_id in enumerate(list(st.session_state.custom_columns)):
                 c_col1, c_col2, c_col3, c_col4 = st.columns([2, 2, 2, 1])
                 
                 with c_col1:
-                    target_name = st.text_input(f"New Column Name #{idx+1}", key=f"custom_name_{c_item['id']}")
+                    target_name = st.text_input(f"New Column Name #{idx+1}", key=f"custom_name_{c_id}")
                 with c_col2:
-                    current_options = ["(Select Column)", "(Manual Input)"] + sorted(source_columns)
-                    source_sel = st.selectbox(f"Map From #{idx+1}", options=current_options, key=f"custom_src_{c_item['id']}")
+                    source_sel = st.selectbox(f"Map From #{idx+1}", options=col_options_custom, key=f"custom_src_{c_id}")
                 with c_col3:
-                    manual_val = st.text_input(f"Static Value #{idx+1}", key=f"custom_val_{c_item['id']}")
+                    manual_val = st.text_input(f"Static Value #{idx+1}", key=f"custom_val_{c_id}")
                 with c_col4:
-                    if st.button("x", key=f"del_{c_item['id']}"):
-                        st.session_state.custom_columns.pop(idx)
+                    if st.button("x", key=f"del_{c_id}"):
+                        del st.session_state.custom_columns[c_id]
                         st.rerun()
                 
                 if target_name:
                     custom_column_data.append((target_name, source_sel, manual_val))
 
+            # Final mapping, shared by the preview, the downloads and the saved config
+            final_rename_map, final_static_map, keep_columns = build_final_mapping(
+                rename_mapping, static_mapping, custom_column_data
+            )
+            mapping_sig = mapping_signature(uploaded_file.file_id, final_rename_map, final_static_map, keep_columns)
+
             # --- PREVIEW MAPPED DATA & VALIDATION ---
             st.write("---")
             st.subheader("Preview & Validation")
@@ -358,75 +717,43 @@ def main():
             available_cols = []
 
             try:
-                preview_rename = rename_mapping.copy()
-                preview_static = static_mapping.copy()
-                preview_keep = list(rename_mapping.values())
-
-                for t_name, s_sel, m_val in custom_column_data:
-                    clean_target = t_name.strip()
-                    if not clean_target: continue
-                    if s_sel == "(Manual Input)":
-                        preview_static[clean_target] = m_val
-                        preview_keep.append(clean_target)
-                    if s_sel == "(Auto Calculate)":
-                         # User explicitly wants backend to handle it
-                         continue
-                    elif s_sel != "(Select Column)":
-                        preview_rename[s_sel] = clean_target
-                        preview_keep.append(clean_target)
-                
-                df_final = df.copy()
-                df_final = df_final.rename(columns=preview_rename)
-                for col, val in preview_static.items():
-                    df_final[col] = val
-
-                # Custom Columns Numeric Cleaning (width_ft, height_ft)
-                # If these came from custom columns (static or mapped), ensure they are numeric
-                numeric_fields = ['width_ft', 'height_ft', 'base_rate_per_month', 'base_rate_per_unit', 'card_rate_per_month', 'card_rate_per_unit']
-                for nf in numeric_fields:
-                    if nf in df_final.columns:
-                        # Force to numeric, coerce errors to NaN
-                        df_final[nf] = pd.to_numeric(df_final[nf], errors='coerce')
+                # Only rebuild the mapped preview when the mapping actually changed
+                preview_cache = st.session_state.get("_preview_cache")
+                if preview_cache and preview_cache[0] == mapping_sig:
+                    _, df_final, preview_table = preview_cache
+                else:
+                    # Only the displayed head is mapped; the kept columns don't depend on row count
+                    df_final = build_mapped_frame(df.head(), final_rename_map, final_static_map, keep_columns)
+                    # Converted once per mapping; st.dataframe serializes an Arrow table without a pandas pass
+                    preview_table = to_arrow_table(df_final)
+                    st.session_state["_preview_cache"] = (mapping_sig, df_final, preview_table)
                 
-                # Filter to show only mapped columns
-                available_cols = [c for c in list(set(preview_keep)) if c in df_final.columns]
+                # Filter to show only mapped columns (keep_columns is already de-duplicated in mapping order)
+                available_cols = df_final.columns.tolist()
                 
                 if available_cols:
-                    st.dataframe(df_final[available_cols].head())
+                    st.dataframe(preview_table if preview_table is not None else df_final)
                     
                     # --- NEW: VALIDATION CHECK LOGIC ---
                     schema = load_validation_schema()
                     
                     if schema:
-                        missing_required = []
-                        current_columns = df_final[available_cols].columns.tolist()
-                        
-                        for field, rules in schema.items():
-                            # Check if field is required and missing from our mapped columns
-                            if rules.get("required") and field not in current_columns:
-                                
-                                # --- NEW: Single Column Exception Logic ---
-                                # 1. Dimensions Check
-                                if field in ['width_ft', 'height_ft']:
-                                    # If 'dimensions' exists, we consider width/height satisfied
-                                    if 'dimensions' in current_columns:
-                                        continue
-                                
-                                # 2. Coordinates Check
-                                if field in ['latitude', 'longitude']:
-                                    # If 'coordinates' exists, we consider lat/long satisfied
-                                    if 'coordinates' in current_columns:
-                                        continue
-                                
-                                # Check if user selected "Auto Calculate" for this field?
-                                # Unfortunately we didn't track it cleanly above. Let's inspect st.session_state keys.
-                                widget_key = f"std_{field}"
-                                user_selection = st.session_state.get(widget_key)
-                                
-                                if user_selection == "(Auto Calculate)":
-                                    continue # Skip validation error
-                                
-                                missing_required.append(field)
+                        # Columns the mapping provides, plus the fields a single combined column covers
+                        satisfied = set(available_cols)
+                        # --- NEW: Single Column Exception Logic ---
+                        # 1. Dimensions Check: 'dimensions' satisfies width/height
+                        if 'dimensions' in satisfied:
+                            satisfied.update(('width_ft', 'height_ft'))
+                        # 2. Coordinates Check: 'coordinates' satisfies lat/long
+                        if 'coordinates' in satisfied:
+                            satisfied.update(('latitude', 'longitude'))
+
+                        # Fields set to "(Auto Calculate)" in their standard selectbox are filled by the pipeline
+                        missing_required = [
+                            field for field, rules in schema.items()
+                            if rules.get("required") and field not in satisfied
+                            and st.session_state.get(f"std_{field}") != "(Auto Calculate)"
+                        ]
                         
                         if missing_required:
                             st.error(f" **Validation Failed!** The following required columns are missing: {missing_required}")
@@ -450,12 +777,22 @@ def main():
                 validation_passed = False
 
             # --- DOWNLOAD BUTTONS ---
-            if available_cols:
-                df_download = df_final[available_cols]
+            # The downloads cover the whole file, so the full parse only happens on request
+            if available_cols and st.toggle("Prepare mapped file downloads (CSV / Excel)", key="prepare_downloads"):
+                # Serialized files are kept until the mapping changes, so clicking a
+                # download button (which reruns the script) doesn't rebuild them
+                download_cache = st.session_state.get("_download_cache")
+                if download_cache and download_cache[0] == mapping_sig:
+                    _, csv = download_cache
+                else:
+                    with st.spinner("Parsing the full file..."):
+                        df_full = read_uploaded_file(uploaded_file)
+                        df_download = build_mapped_frame(df_full, final_rename_map, final_static_map, keep_columns)
+                        csv = dataframe_to_csv_bytes(df_download)
+                    st.session_state["_download_cache"] = (mapping_sig, csv)
                 d_col1, d_col2 = st.columns(2)
                 
                 # 1. CSV Download
-                csv = df_download.to_csv(index=False).encode('utf-8')
                 d_col1.download_button(
                     label="Download as CSV",
                     data=csv,
@@ -465,62 +802,78 @@ def main():
                 )
                 
                 # 2. Excel Download
-                import io
-                buffer = io.BytesIO()
-                with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                    df_download.to_excel(writer, index=False, sheet_name='Sheet1')
-                
-                d_col2.download_button(
-                    label="Download as Excel",
-                    data=buffer.getvalue(),
-                    file_name="mapped_data.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    width="content"
-                )
+                # Workbook encoding is the slowest export, so it's only built when asked for
+                xlsx_cache = st.session_state.get("_xlsx_cache")
+                xlsx = xlsx_cache[1] if xlsx_cache and xlsx_cache[0] == mapping_sig else None
+                if xlsx is None and d_col2.button("Prepare Excel download"):
+                    with st.spinner("Building the Excel file..."):
+                        # Full parse is served from the upload cache
+                        df_download = build_mapped_frame(read_uploaded_file(uploaded_file), final_rename_map, final_static_map, keep_columns)
+                        xlsx = dataframe_to_xlsx_bytes(df_download, to_arrow_table(df_download))
+                    st.session_state["_xlsx_cache"] = (mapping_sig, xlsx)
+                if xlsx is not None:
+                    d_col2.download_button(
+                        label="Download as Excel",
+                        data=xlsx,
+                        file_name="mapped_data.xlsx",
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        width="content"
+                    )
 
             # --- 3. Execution ---
             st.header("3. Execution")
             
+            # Offer an explicit override once a run has completed in this session
+            force_rerun = False
+            if st.session_state.get("last_successful_run"):
+                force_rerun = st.checkbox("Re-run even if this file and mapping were already processed", key="force_rerun")
+            
             # Button is DISABLED if validation_passed is False
             if st.button("Save Configuration & Run Pipeline", type="primary", disabled=not validation_passed):
                 
-                final_rename_map = rename_mapping.copy()
-                final_static_map = static_mapping.copy()
-                keep_columns = list(rename_mapping.values())
+                run_mapping = {
+                    "rename_mapping": final_rename_map,
+                    "static_mapping": final_static_map,
+                    "keep_columns": keep_columns,
+                }
                 
-                for t_name, s_sel, m_val in custom_column_data:
-                    clean_target = t_name.strip()
-                    if not clean_target: continue
-                    if s_sel == "(Manual Input)":
-                        final_static_map[clean_target] = m_val
-                        keep_columns.append(clean_target)
-                    elif s_sel != "(Select Column)":
-                        final_rename_map[s_sel] = clean_target
-                        keep_columns.append(clean_target)
-
-                # Save CSV
-                saved_filename = save_uploaded_file_to_supabase(uploaded_file)
+                # Skip the upload + Prefect run if the last successful run used identical inputs
+                with uploaded_file.getbuffer() as view:
+                    run_key = compute_run_key(view, run_mapping)
+                last_run = st.session_state.get("last_successful_run")
+                if last_run and last_run["key"] == run_key and not force_rerun:
+                    st.info("This file and mapping were already processed in this session. Showing the previous result instead of re-running the pipeline.")
+                    if last_run["dashboard_url"]:
+                        st.link_button("👉 View Run in Prefect Cloud", url=last_run["dashboard_url"], type="primary")
+                    render_output_download(last_run["output_filename"])
+                    st.stop()
+
+                # Config only depends on the (content-hashed) stored name and the mapping, so it
+                # can be built up front and both uploads can overlap their round-trips.
+                saved_filename = stored_input_filename(uploaded_file)
+                # One config per file + mapping: runs with different mappings of the same file
+                # never share (or overwrite) a config, and identical runs reuse theirs.
+                # Extension-aware, so .xlsx/.xls uploads also get a distinct *_config.json
+                mapping_filename = f"{PurePosixPath(saved_filename).stem}_{run_key[:12]}_config.json"
+                config_data = {
+                    "source_file": saved_filename,
+                    **run_mapping,
+                    "original_filename": uploaded_file.name
+                }
+                # Sorted keys keep the file byte-identical for identical mappings
+                config_bytes = orjson.dumps(config_data, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS)
+
+                # Save CSV + Config concurrently (UI calls stay on the script thread)
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    upload_future = executor.submit(save_uploaded_file_to_supabase, uploaded_file, saved_filename)
+                    config_future = executor.submit(save_mapping_config, mapping_filename, config_bytes)
+                saved_filename = upload_future.result()
                 
                 if saved_filename:
                     st.toast(f"File uploaded to Supabase: {saved_filename}")
 
-                    # Save Config
-                    mapping_filename = saved_filename.replace(".csv", "_config.json")
-                    config_data = {
-                        "source_file": saved_filename,
-                        "rename_mapping": final_rename_map,
-                        "static_mapping": final_static_map,
-                        "keep_columns": list(set(keep_columns)),
-                        "original_filename": uploaded_file.name
-                    }
-                    
                     try:
-                        config_json = json.dumps(config_data, indent=4)
-                        res = supabase.storage.from_(BUCKET_MAPPING).upload(
-                            path=mapping_filename,
-                            file=config_json.encode('utf-8'),
-                            file_options={"content-type": "application/json"}
-                        )
+                        config_future.result()
                         st.toast("Mapping configuration saved.")
                     except Exception as e:
                         st.error(f"Failed to save config: {e}")
@@ -554,7 +907,10 @@ def main():
                     st.write("---")
                     issues_expander = st.expander("⚠️ Live Issues & Warnings", expanded=True)
                     issues_placeholder = issues_expander.empty()
-                    issues_list = []
+                    # Running tallies instead of rescanning every issue seen so far
+                    issue_count = 0
+                    retry_count = 0
+                    other_issues = collections.deque(maxlen=10)
                     
                     # Log container to show output
                     log_expander = st.expander("Show Execution Logs", expanded=False) # Collapsed by default now
@@ -563,10 +919,19 @@ def main():
                     # Placeholder for the Dashboard Button (Early Detection)
                     dashboard_button_placeholder = st.empty()
                     
-                    full_logs = []
+                    full_logs = collections.deque(maxlen=LOG_HISTORY_LINES)
+                    # Every output line (progress updates included) for the log download and the end-of-run
+                    # URL search; spills to disk past SPOOL_MAX_BYTES. The bounded deques remain the render path.
+                    run_log = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, mode="w+", encoding="utf-8")
+                    # The live panel renders entries parsed once per batch; full_logs is for the final dump
+                    live_entries = collections.deque(maxlen=LIVE_LOG_ENTRIES)
+                    last_log_render = 0.0
                     
                     # Data structures for Gantt Chart
                     task_events = [] # List of dicts: {Task, Start, End, Status}
+                    gantt_dirty = False  # a task started/finished since the last chart render
+                    saving_started = False
+                    last_gantt_render = 0.0
                     current_task = None
                     start_time = datetime.now()
                     
@@ -574,38 +939,50 @@ def main():
                     final_output_filename = None
                     step_placeholder = None
 
+                    # Helper to render the Live Issues panel from the running tallies
+                    def render_issues(view):
+                        with issues_placeholder.container():
+                            if view == "retries":
+                                # Retry summary, with only the latest *other* errors below
+                                st.warning(f"⚠️ Connection Instability: {retry_count} Retries detected (OpenStreetMap/Geocoding)", icon="📡")
+                                for issue in list(other_issues)[-5:]:
+                                    st.error(issue, icon="🚨")
+                            else:
+                                # If we have retries, show that summary first
+                                if retry_count > 0:
+                                    st.warning(f"⚠️ Connection Instability: {retry_count} Retries detected (OpenStreetMap/Geocoding)", icon="📡")
+                                
+                                # Then show other errors
+                                for issue in other_issues:
+                                    if "ERROR" in issue or "Exception" in issue:
+                                        st.error(issue, icon="🚨")
+                                    else:
+                                        st.warning(issue, icon="⚠️")
+
+                    last_issue_render = 0.0
+                    issues_pending = None  # view skipped by the throttle, drawn once the stream ends
+
                     # Helper to render logs
-                    def render_logs(raw_lines, limit=50):
-                        parsed = LogParser.parse_logs(raw_lines)
-                        # Show last N entries if limit is set
-                        if limit:
-                            recent = parsed[-limit:]
-                        else:
-                            recent = parsed
-                        
-                        html_content = "<div style='font-family:monospace; font-size:12px; line-height:1.4;'>"
+                    def render_logs(recent):
+                        # Collected in a list and joined once instead of growing one string per entry
+                        parts = [LOG_PANEL_OPEN]
                         for entry in recent:
                             color = LogParser.get_color_for_level(entry['level'])
-                            ts = entry['timestamp']
-                            lvl = entry['level']
-                            msg = entry['message']
-                            details = entry['details']
-                            
                             # Escape HTML sensitive chars
-                            msg = msg.replace("<", "&lt;").replace(">", "&gt;")
-                            
-                            html_content += f"<div style='border-bottom: 1px solid #333; padding: 2px 0;'>"
-                            html_content += f"<span style='color:#666; margin-right:8px;'>{ts}</span>"
-                            html_content += f"<span style='color:{color}; font-weight:bold; margin-right:8px; min-width:60px; display:inline-block;'>{lvl}</span>"
-                            html_content += f"<span style='color:#ddd;'>{msg}</span>"
-                            
+                            msg = entry['message'].replace("<", "&lt;").replace(">", "&gt;")
+
+                            parts.append(
+                                f"{LOG_ROW_OPEN}<span style='color:#666; margin-right:8px;'>{entry['timestamp']}</span>"
+                                f"<span style='color:{color}; {LOG_LEVEL_STYLE}'>{entry['level']}</span>"
+                                f"<span style='color:#ddd;'>{msg}</span>"
+                            )
+                            details = entry['details']
                             if details:
                                 safe_details = details.replace("<", "&lt;").replace(">", "&gt;")
-                                html_content += f"<div style='background:#1e1e1e; color:#e74c3c; padding:4px; margin-top:2px; white-space:pre-wrap;'>{safe_details}</div>"
-                            
-                            html_content += "</div>"
-                        html_content += "</div>"
-                        return html_content
+                                parts.append(f"{LOG_DETAILS_OPEN}{safe_details}</div>")
+                            parts.append("</div>")
+                        parts.append("</div>")
+                        return "".join(parts)
                     
                     # Use Popen for real-time output reading
                     try:
@@ -613,88 +990,78 @@ def main():
                             cmd, 
                             stdout=subprocess.PIPE, 
                             stderr=subprocess.STDOUT, 
-                            text=True, 
-                            bufsize=1, 
-                            universal_newlines=True,
-                            encoding='utf-8', 
-                            errors='replace'
+                            # Raw bytes: drain_stream reads and decodes in chunks
+                            bufsize=0,
+                            # A piped child block-buffers stdout; unbuffered lets lines arrive as they are logged
+                            env={**os.environ, "PYTHONUNBUFFERED": "1"}
                         )
                         
-                        # Pipeline Steps for Tracking Progress
-                        steps_map = {
-                            "Step 1": 15,
-                            "Step 2": 30,
-                            "Step 3": 50,
-                            "Step 4": 70,
-                            "Step 5": 85,
-                            "Saving Output": 95
-                        }
-                        
                         dashboard_url_found = False
+                        dashboard_url = None
+
+                        # stdout is drained on a background thread so reads don't stall on UI redraws;
+                        # the loop below works through it in batches, and the bounded queue caps memory
+                        line_queue = queue.Queue(maxsize=LOG_QUEUE_MAX_LINES)
+                        threading.Thread(target=drain_stream, args=(process.stdout, line_queue), daemon=True).start()
+                        stdout_done = False
+
+                        while not stdout_done:
+                            batch = next_log_batch(line_queue)
+                            if not batch:
+                                continue
+
+                            # One timestamp per batch: its lines arrived within the same ~100 ms
+                            # window, well below the timeline's one-second resolution
+                            now = datetime.now()
+                            new_log_lines = []
+
+                            for line in batch:
+                                if line is None:
+                                    stdout_done = True
+                                    break
 
-                        while True:
-                            # Read line by line
-                            line = process.stdout.readline()
-                            
-                            if not line and process.poll() is not None:
-                                break
-                                
-                            if line:
                                 clean_line = line.strip()
+                                run_log.write(clean_line + "\n")
                                 
                                 # Only append to visual logs if it's NOT a high-frequency progress update
                                 if "Step 2 Progress" not in clean_line:
                                     full_logs.append(clean_line)
-                                    
-                                # Render structured logs
-                                log_placeholder.markdown(render_logs(full_logs), unsafe_allow_html=True)
+                                    new_log_lines.append(clean_line)
                                 
                                 # --- PARSING LOGIC ---
-                                now = datetime.now()
+                                # Plain INFO chatter is the bulk of the output; skip it in one scan
+                                line_events = {m.lastgroup for m in LOG_EVENT_PATTERN.finditer(clean_line)}
+                                if not line_events:
+                                    continue
                                 
                                 # 1. Issue Detection (Warnings/Errors)
-                                if "WARNING" in clean_line or "ERROR" in clean_line or "Retrying" in clean_line or "Exception" in clean_line:
-                                    # Aggregate Retries
-                                    if "Retrying" in clean_line and "urllib3" in clean_line:
-                                        # Parse count if possible or just increment global retry count
-                                        retry_count = sum(1 for i in issues_list if "Retrying" in i) + 1
-                                        issues_list.append(clean_line)
-                                        
-                                        # Clear and re-render the issues container with a summary
-                                        with issues_placeholder.container():
-                                            st.warning(f"⚠️ Connection Instability: {retry_count} Retries detected (OpenStreetMap/Geocoding)", icon="📡")
-                                            # Show only unique *other* errors below
-                                            other_issues = [i for i in issues_list if "Retrying" not in i]
-                                            for issue in other_issues[-5:]:
-                                                st.error(issue, icon="🚨")
+                                if "issue" in line_events:
+                                    issue_count += 1
+                                    if "Retrying" in clean_line:
+                                        retry_count += 1
                                     else:
-                                        # Standard error display
-                                        issues_list.append(clean_line)
-                                        with issues_placeholder.container():
-                                            # If we have retries, show that summary first
-                                            retry_count = sum(1 for i in issues_list if "Retrying" in i)
-                                            if retry_count > 0:
-                                                st.warning(f"⚠️ Connection Instability: {retry_count} Retries detected (OpenStreetMap/Geocoding)", icon="📡")
-                                            
-                                            # Then show other errors
-                                            other_issues = [i for i in issues_list if "Retrying" not in i]
-                                            for issue in other_issues[-10:]:
-                                                if "ERROR" in issue or "Exception" in issue:
-                                                    st.error(issue, icon="🚨")
-                                                else:
-                                                    st.warning(issue, icon="⚠️")
+                                        other_issues.append(clean_line)
+
+                                    # A new distinct issue is shown immediately; retry storms only
+                                    # refresh the counter a few times per second
+                                    issues_view = "retries" if "Retrying" in clean_line and "urllib3" in clean_line else "issues"
+                                    tick = time.monotonic()
+                                    if "Retrying" not in clean_line or tick - last_issue_render > ISSUE_REDRAW_INTERVAL:
+                                        render_issues(issues_view)
+                                        last_issue_render = tick
+                                        issues_pending = None
+                                    else:
+                                        issues_pending = issues_view
                                 
                                 # 2. Check for Prefect Cloud URL
-                                if not dashboard_url_found and "View at https" in clean_line:
-                                    import re
-                                    match = re.search(r"View at (https?://[^\s]+)", clean_line)
-                                    if match:
-                                        url = match.group(1).rstrip('.')
-                                        dashboard_button_placeholder.link_button("👉 Monitor Real-Time in Prefect Cloud", url=url, type="primary")
+                                if not dashboard_url_found and "url" in line_events:
+                                    dashboard_url = extract_prefect_url(clean_line)
+                                    if dashboard_url:
+                                        dashboard_button_placeholder.link_button("👉 Monitor Real-Time in Prefect Cloud", url=dashboard_url, type="primary")
                                         dashboard_url_found = True
 
                                 # 3. Check for Steps & Metrics
-                                if ">>> Step" in clean_line:
+                                if "step" in line_events:
                                     try:
                                         content_part = clean_line.split(">>> ", 1)[1]
                                         
@@ -764,6 +1131,7 @@ def main():
                                                 "Status": "Running"
                                             }
                                             task_events.append(new_task)
+                                            gantt_dirty = True
                                             current_task = new_task
                                             
                                             # 1. Append Header to Container
@@ -773,11 +1141,10 @@ def main():
                                             step_placeholder = status_container.empty()
                                             
                                             # Update Progress Bar
-                                            prog_val = 0
-                                            for k, v in steps_map.items():
-                                                if k in step_prefix:
-                                                    prog_val = v
-                                                    break
+                                            # Step markers normally match a key exactly; the scan is only a fallback
+                                            prog_val = STEP_PROGRESS.get(step_prefix) or next(
+                                                (v for k, v in STEP_PROGRESS.items() if k in step_prefix), 0
+                                            )
                                             if prog_val > 0:
                                                 progress_bar.progress(prog_val, text=f"Running: {step_desc}")
 
@@ -785,58 +1152,66 @@ def main():
                                         pass
 
                                 # Capture Output Filename
-                                if "Saving Output" in clean_line:
+                                if "saving" in line_events:
                                     try:
-                                        # Reset current task if needed
-                                        if current_task:
-                                            current_task['End'] = now
-                                            current_task['Status'] = 'Completed'
+                                        # The marker can be echoed more than once (print + Prefect log);
+                                        # only the first one opens the saving task
+                                        if not saving_started:
+                                            saving_started = True
+
+                                            # Reset current task if needed
+                                            if current_task:
+                                                current_task['End'] = now
+                                                current_task['Status'] = 'Completed'
+                                                
+                                            # Start saving task
+                                            new_task = {
+                                                "Task": "Saving Output",
+                                                "Start": now,
+                                                "End": now,
+                                                "Status": "Running"
+                                            }
+                                            task_events.append(new_task)
+                                            gantt_dirty = True
+                                            current_task = new_task
                                             
-                                        # Start saving task
-                                        new_task = {
-                                            "Task": "Saving Output",
-                                            "Start": now,
-                                            "End": now,
-                                            "Status": "Running"
-                                        }
-                                        task_events.append(new_task)
-                                        current_task = new_task
-                                        
-                                        status_container.markdown("### 💾 Saving Result to Supabase...")
-                                        progress_bar.progress(95, text="Finalizing...")
+                                            status_container.markdown("### 💾 Saving Result to Supabase...")
+                                            progress_bar.progress(95, text="Finalizing...")
                                         
                                         # Regex to find filename if needed
-                                        import re
-                                        match_fname = re.search(r"Saving Output:\s*(.*?)(?:\.\.\.|$)", clean_line)
+                                        match_fname = SAVING_OUTPUT_PATTERN.search(clean_line)
                                         if match_fname:
                                             final_output_filename = match_fname.group(1).strip()
                                     except Exception as rx:
                                         pass
 
-                                # --- UPDATE GANTT CHART ---
-                                if task_events:
-                                    # Update current task end time to now for visualization effect
-                                    if current_task and current_task["Status"] == "Running":
-                                        current_task["End"] = now
-                                    
-                                    # Create DataFrame
-                                    df_gantt = pd.DataFrame(task_events)
-                                    
-                                    # Render Chart
-                                    chart = alt.Chart(df_gantt).mark_bar().encode(
-                                        x=alt.X('Start', title='Time', axis=alt.Axis(format='%H:%M:%S')),
-                                        x2='End',
-                                        y=alt.Y('Task', sort=None, title=None), # Keep insertion order
-                                        color=alt.Color('Status', scale=alt.Scale(domain=['Running', 'Completed', 'Failed'], range=['#3498db', '#2ecc71', '#e74c3c'])),
-                                        tooltip=['Task', 'Start', 'End', 'Status']
-                                    ).properties(
-                                        title="Live Pipeline Timeline",
-                                        width="container",
-                                        height=200
-                                    )
+                            # Each line is parsed once; continuation lines at the start of a batch
+                            # (e.g. the rest of a traceback) extend the last entry already shown
+                            if new_log_lines:
+                                live_entries.extend(LogParser.parse_logs(new_log_lines, live_entries[-1] if live_entries else None))
+
+                            # Redraw the logs on a throttled tick rather than once per line; the
+                            # full dump after the run catches anything the last tick skipped
+                            if time.monotonic() - last_log_render > LOG_REDRAW_INTERVAL:
+                                log_placeholder.markdown(render_logs(live_entries), unsafe_allow_html=True)
+                                last_log_render = time.monotonic()
+
+                            # --- UPDATE GANTT CHART ---
+                            # Chart encoding is expensive: redraw at most every GANTT_REDRAW_INTERVAL,
+                            # and only for a task transition or to stretch the running task's bar
+                            task_running = current_task is not None and current_task["Status"] == "Running"
+                            if task_events and (gantt_dirty or task_running) and time.monotonic() - last_gantt_render > GANTT_REDRAW_INTERVAL:
+                                gantt_dirty = False
+                                last_gantt_render = time.monotonic()
+                                # Update current task end time to now for visualization effect
+                                if current_task and current_task["Status"] == "Running":
+                                    current_task["End"] = datetime.now()
                                     
-                                    timeline_container.altair_chart(chart, theme="streamlit")
+                                timeline_container.vega_lite_chart(gantt_chart_spec(task_events, "Live Pipeline Timeline"), theme="streamlit")
 
+                        # Show the final retry count if the last redraw was throttled
+                        if issues_pending:
+                            render_issues(issues_pending)
 
                         # Wait for process to finish
                         return_code = process.wait()
@@ -847,62 +1222,50 @@ def main():
                             current_task['Status'] = 'Completed' if return_code == 0 else 'Failed'
                             
                             # Final Chart Update
-                            df_gantt = pd.DataFrame(task_events)
-                            chart = alt.Chart(df_gantt).mark_bar().encode(
-                                x=alt.X('Start', title='Time', axis=alt.Axis(format='%H:%M:%S')),
-                                x2='End',
-                                y=alt.Y('Task', sort=None),
-                                color=alt.Color('Status', scale=alt.Scale(domain=['Running', 'Completed', 'Failed'], range=['#3498db', '#2ecc71', '#e74c3c'])),
-                            ).properties(title="Final Execution Timeline", width="container", height=200)
-                            timeline_container.altair_chart(chart, theme="streamlit")
-
-                        # Final log dump (full)
-                        log_placeholder.markdown(render_logs(full_logs, limit=None), unsafe_allow_html=True)
+                            timeline_container.vega_lite_chart(gantt_chart_spec(task_events, "Final Execution Timeline"), theme="streamlit")
+
+                        # Final log dump: the last LOG_HISTORY_LINES lines on screen, the complete log as a download
+                        log_placeholder.markdown(render_logs(LogParser.parse_logs(full_logs)), unsafe_allow_html=True)
+                        # If we hadn't found the URL yet (rare), scan the full log line by line from the spool
+                        if not dashboard_url_found:
+                            run_log.seek(0)
+                            dashboard_url = next(filter(None, map(extract_prefect_url, run_log)), None)
+                        run_log.seek(0)
+                        log_expander.download_button(
+                            label="Download full execution log",
+                            data=run_log.read(),
+                            file_name="pipeline_execution.log",
+                            mime="text/plain",
+                            width="content",
+                            # Downloading must not rerun the script, which would wipe this run's results
+                            on_click="ignore"
+                        )
+                        # Streamlit keeps its own copy of the log; release the spool right away
+                        run_log.close()
 
                         if return_code == 0:
                             progress_bar.progress(100, text="Pipeline Completed Successfully!")
                             status_container.update(label="Pipeline Finished ✅", state="complete", expanded=False)
                             st.success("Pipeline executed successfully!")
                             
-                            # If we hadn't found the URL yet (rare), check full logs again
+                            # URL recovered from the full log after the run (rare)
                             if not dashboard_url_found:
-                                combined_output = "\n".join(full_logs)
-                                import re
-                                dashboard_match = re.search(r"View at (https?://[^\s]+)", combined_output)
-                                if dashboard_match:
-                                    dashboard_url = dashboard_match.group(1).rstrip('.')
+                                if dashboard_url:
                                     dashboard_button_placeholder.link_button("👉 View Run in Prefect Cloud", url=dashboard_url, type="primary")
                             
                             # --- DOWNLOAD BUTTON FOR OUTPUT ---
-                            # Fallback: Calculate expected filename deterministically
+                            # Fallback: Calculate expected filename deterministically (same helper as the flow)
                             if not final_output_filename:
-                                try:
-                                    base_name = os.path.splitext(uploaded_file.name)[0]
-                                    final_output_filename = f"processed_{base_name}.csv"
-                                except:
-                                    pass
+                                final_output_filename = output_filename_for(uploaded_file.name)
 
                             if final_output_filename:
-                                try:
-                                    st.write("---")
-                                    st.subheader("📥 Download Results")
-                                    # Check if file exists (optimized check not really possible via simple storage API, just try download)
-                                    with st.spinner(f"Fetching processed file: {final_output_filename}..."):
-                                        data = supabase.storage.from_(BUCKET_OUTPUT).download(final_output_filename)
-                                        
-                                        col_dl1, col_dl2 = st.columns([1, 1])
-                                        with col_dl1:
-                                            st.download_button(
-                                                label="📥 Download Processed File (CSV)",
-                                                data=data,
-                                                file_name=final_output_filename,
-                                                mime="text/csv",
-                                                type="primary"
-                                            )
-                                        st.success("File ready for download!")
-                                except Exception as e:
-                                    st.error(f"Error fetching output file `{final_output_filename}`: {str(e)}")
-                                    st.warning("Please check your Supabase 'output' bucket to verify if the file was saved.")
+                                # Remember this run so an identical re-submit can reuse it
+                                st.session_state.last_successful_run = {
+                                    "key": run_key,
+                                    "output_filename": final_output_filename,
+                                    "dashboard_url": dashboard_url
+                                }
+                                render_output_download(final_output_filename)
                             else:
                                 st.warning("Could not determine output filename (Logic Error).")
                                 
@@ -910,12 +1273,14 @@ def main():
                             progress_bar.progress(0, text="Pipeline Failed ❌")
                             status_container.update(label="Pipeline Failed ❌", state="error", expanded=True)
                             # Dont show generic error if issues list has details
-                            if issues_list:
+                            if issue_count:
                                 st.error("Pipeline failed with issues found above.")
                             else:
                                 st.error("Pipeline failed! Check the logs above.")                            
                     except Exception as e:
                         st.error(f"Execution Error: {e}")
+                    finally:
+                        run_log.close()
                 else:
                     st.error("Upload failed, cannot proceed.")
                     